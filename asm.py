@@ -1,12 +1,19 @@
 # SPDX-License-Identifier: MIT
 """A simple LMC assembler"""
 
+import hashlib
+import os
+import re
 import sys
-from typing import TypeAlias
+from pathlib import Path
+from typing import Callable, TypeAlias
 
-Labels: TypeAlias = dict[str, int | None]
+Labels: TypeAlias = dict[str, int]
+Fixups: TypeAlias = list[tuple[int, int, str]]
+Handler: TypeAlias = Callable[[str | None, str | None, int, Fixups], int | None]
 
 TAB = "    "
+CACHE_DIR = Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache") / "lmc"
 instructions: dict[str, int] = {
     "ADD": 100,
     "SUB": 200,
@@ -20,17 +27,33 @@ instructions: dict[str, int] = {
     "HLT": 0,
 }
 
+_BRANCH = frozenset(("BRA", "BRZ", "BRP"))
+_ADDRESS_OPCODES = range(100, 900)
+"""The base opcodes of instructions that take an address, ADD to BRP."""
+_OPCODES_GET = instructions.get
+
+_LINE_RE = re.compile(
+    r"\s*(?:([A-Za-z_]\w*)\s+)?"
+    r"(ADD|SUB|STA|LDA|BRA|BRZ|BRP|INP|OUT|HLT|DAT)"
+    r"(?:\s+(?:(-?\d+)|([A-Za-z_]\w*)))?\s*$"
+)
+"""Matches a well-formed line: an optional label, the mnemonic and an optional
+number or label operand."""
+
 
 def process_line(code: str) -> int:
     """Returns the opcode for the instruction.
 
+    Only used on the error-reporting path, well-formed lines get their opcode
+    from the handler in _HANDLERS.
+
     Args:
-        line (list[str]): The instruction.
+        code (str): The mnemonic of the instruction.
 
     Returns:
         int: The opcode for the instruction. -1 if the instruction does not exist.
     """
-    return instructions.get(code, -1)
+    return _OPCODES_GET(code, -1)
 
 
 def is_branch(code: str) -> bool:
@@ -42,7 +65,7 @@ def is_branch(code: str) -> bool:
     Returns:
         bool: Whether the instruction is a branch instruction.
     """
-    return code in ["BRA", "BRZ", "BRP"]
+    return code in _BRANCH
 
 
 def needs_address(code: str) -> bool:
@@ -54,44 +77,87 @@ def needs_address(code: str) -> bool:
     Returns:
         bool: Whether the instruction needs an address.
     """
-    if code not in instructions:
-        return False
-
-    if code == "INP":
-        return False
-    elif code == "OUT":
-        return False
-    elif code == "HLT":
-        return False
-    else:
-        return True
+    return _OPCODES_GET(code, -1) in _ADDRESS_OPCODES
 
 
-class Lazy:
-    """A lazy opcode that needs to be resolved later."""
+def _dat(
+    number: str | None,
+    location: str | None,
+    len_machine_code: int,
+    fixups: Fixups,
+) -> int | None:
+    """Assembles a DAT line.
 
-    def __init__(self, code: int, item: str, labels: Labels):
-        """Creates a lazy opcode.
+    Args:
+        number (str | None): The number operand.
+        location (str | None): The label operand.
+        len_machine_code (int): The length of the machine code so far.
+        fixups (Fixups): Label references that need to be resolved later.
 
-        Args:
-            code (int): The base opcode.
-            item (str): The referenced address.
-            labels (Labels): A lookup table for labels.
-        """
-        self.code = code
-        self.item = item
-        self.lookup = labels
+    Returns:
+        int | None: The value. None if the operand is not a number.
+    """
+    if number is None:
+        return None
+    return int(number)
 
-    def __int__(self) -> int:
-        value = self.lookup.get(self.item)
-        if value is None:
-            print(f"error: label '{self.item}' not found")
-            exit(1)
 
-        return self.code + value
+def _no_address(op_code: int) -> Handler:
+    """Creates a handler for an instruction that takes no address.
+
+    Args:
+        op_code (int): The opcode of the instruction.
+
+    Returns:
+        Handler: The handler, any operand is ignored.
+    """
+
+    def handler(
+        number: str | None,
+        location: str | None,
+        len_machine_code: int,
+        fixups: Fixups,
+    ) -> int | None:
+        return op_code
 
-    def __str__(self) -> str:
-        return str(int(self))
+    return handler
+
+
+def _address(op_code: int) -> Handler:
+    """Creates a handler for an instruction that needs an address.
+
+    Args:
+        op_code (int): The base opcode of the instruction.
+
+    Returns:
+        Handler: The handler, returns None if the address is missing or out of range.
+    """
+
+    def handler(
+        number: str | None,
+        location: str | None,
+        len_machine_code: int,
+        fixups: Fixups,
+    ) -> int | None:
+        if location is not None:
+            fixups.append((len_machine_code, op_code, location))
+            return op_code
+
+        if number is not None and 0 <= int(number) <= 99:
+            return op_code + int(number)
+        return None
+
+    return handler
+
+
+_HANDLERS: dict[str, Handler] = {
+    "DAT": _dat,
+    **{
+        code: _address(op_code) if needs_address(code) else _no_address(op_code)
+        for code, op_code in instructions.items()
+    },
+}
+"""Assembles a well-formed line, indexed by mnemonic."""
 
 
 def process_instruction(
@@ -99,7 +165,8 @@ def process_instruction(
     line_number: int,
     len_machine_code: int,
     labels: Labels,
-) -> int | Lazy | None:
+    fixups: Fixups,
+) -> int | None:
     """Processes an instruction.
 
     Args:
@@ -107,18 +174,82 @@ def process_instruction(
         line_number (int): The line number of the instruction. Used for error messages.
         len_machine_code (int): The length of the machine code so far.
         labels (Labels): A lookup table for labels.
+        fixups (Fixups): Label references that need to be resolved later.
 
     Returns:
-        int | Lazy | None: The opcode for the instruction.
-            Lazy if the instruction needs to be resolved later.
+        int | None: The opcode for the instruction.
+            Only the base opcode if the address is a label, a fixup is recorded for it.
+            None if there was an error.
+    """
+    match = _LINE_RE.match(instruction)
+    if match is not None:
+        label, code, number, location = match.groups()
+        if label is None or label not in _HANDLERS:
+            if label is not None:
+                labels[label] = len_machine_code
+
+            result = _HANDLERS[code](number, location, len_machine_code, fixups)
+            if result is not None:
+                return result
+
+    # not a well-formed line, take the slow path to report the error
+    return _process_tokens(
+        instruction,
+        line_number,
+        len_machine_code,
+        labels,
+        fixups,
+    )
+
+
+def _process_tokens(
+    instruction: str,
+    line_number: int,
+    len_machine_code: int,
+    labels: Labels,
+    fixups: Fixups,
+) -> int | None:
+    """Processes an instruction token by token, reporting syntax errors.
+
+    Args:
+        instruction (str): The instruction.
+        line_number (int): The line number of the instruction. Used for error messages.
+        len_machine_code (int): The length of the machine code so far.
+        labels (Labels): A lookup table for labels.
+        fixups (Fixups): Label references that need to be resolved later.
+
+    Returns:
+        int | None: The opcode for the instruction.
             None if there was an error.
     """
     instruction_split = instruction.strip().split(" ")
+    column = len(instruction) - len(instruction.lstrip())
+
+    op_code = process_line(instruction_split[0])
+    while op_code == -1 and instruction_split[0] != "DAT":
+        # this is a label
+        labels[instruction_split[0]] = len_machine_code
+        column += len(instruction_split[0]) + 1
+        instruction_split = instruction_split[1:]
+
+        while instruction_split and not instruction_split[0]:
+            column += 1
+            instruction_split = instruction_split[1:]
+
+        if not instruction_split:
+            syntax_error(
+                line_number,
+                instruction,
+                " " * column + "^",
+                "missing instruction",
+            )
+            return None
+
+        op_code = process_line(instruction_split[0])
 
     if instruction_split[0] == "DAT":
         if len(instruction_split) < 2:
-            spaces = len(instruction) - len(instruction.lstrip())
-            hint = " " * (spaces + len(instruction_split[0])) + " " + "^"
+            hint = " " * (column + len(instruction_split[0])) + " " + "^"
             syntax_error(
                 line_number,
                 instruction,
@@ -130,9 +261,8 @@ def process_instruction(
         try:
             value = int(instruction_split[1])
         except ValueError:
-            spaces = len(instruction) - len(instruction.lstrip())
             hint = (
-                " " * (spaces + len(instruction_split[0]))
+                " " * (column + len(instruction_split[0]))
                 + " "
                 + "^" * len(instruction_split[1])
             )
@@ -145,10 +275,9 @@ def process_instruction(
             return None
         return value
 
-    if needs_address(instruction_split[0]):
+    if op_code in _ADDRESS_OPCODES:
         if len(instruction_split) != 2:
-            spaces = len(instruction) - len(instruction.lstrip())
-            hint = " " * (spaces + len(instruction_split[0])) + " " + "^"
+            hint = " " * (column + len(instruction_split[0])) + " " + "^"
             syntax_error(
                 line_number,
                 instruction,
@@ -158,66 +287,40 @@ def process_instruction(
             return None
 
         try:
-            address: int | str = int(instruction_split[1])
+            address = int(instruction_split[1])
         except ValueError:
-            location = instruction_split[1]
-            if location not in labels:
-                labels[location] = None
-
-            return Lazy(process_line(instruction_split[0]), location, labels)
+            fixups.append((len_machine_code, op_code, instruction_split[1]))
+            return op_code
 
         if address < 0 or address > 99:
-            spaces = len(instruction) - len(instruction.lstrip())
             hint = (
-                " " * (spaces + len(instruction_split[0]))
+                " " * (column + len(instruction_split[0]))
                 + " "
                 + "^" * len(instruction_split[1])
             )
             syntax_error(line_number, instruction, hint, "address out of range (0-99)")
 
-        if isinstance(address, str):
-            return Lazy(process_line(instruction_split[0]), address, labels)
-        else:
-            return process_line(instruction_split[0]) + address
+        return op_code + address
 
-    else:
-        op_code = process_line(instruction_split[0])
-        if op_code == -1:
-            # this is a label
-            labels[instruction_split[0]] = len_machine_code
-            new_instruction = " ".join(instruction_split[1:])
-
-            if not new_instruction.strip():
-                spaces = len(instruction) - len(instruction.lstrip())
-                syntax_error(
-                    line_number,
-                    instruction,
-                    " " + " " * (len(instruction_split[0]) + spaces) + "^",
-                    "missing instruction",
-                )
-                exit(1)
-            result = process_instruction(
-                new_instruction,
-                line_number,
-                len_machine_code,
-                labels,
-            )
-            return result
-        return op_code
+    return op_code
 
 
-def compile_lmc(instructions: list[str], labels: Labels) -> list[int | Lazy] | None:
+def compile_lmc(instructions: list[str], labels: Labels) -> list[int] | None:
     """Compiles the LMC assembly into machine code.
 
+    Label references are recorded as fixups in a first pass
+    and resolved once all labels are known.
+
     Args:
         instructions (list[str]): The LMC assembly.
         labels (Labels): A lookup table for labels. Should be empty.
 
     Returns:
-        list[int | Lazy] | None: The machine code, contains Lazy objects that need to be resolved.
+        list[int] | None: The machine code.
             None if there was an error.
-    """  # noqa: E501
-    machine_code: list[int | Lazy] = []
+    """
+    machine_code: list[int] = []
+    fixups: Fixups = []
 
     for line, instruction in enumerate(instructions):
         if not instruction.strip():
@@ -228,6 +331,7 @@ def compile_lmc(instructions: list[str], labels: Labels) -> list[int | Lazy] | N
             line,
             len(machine_code),
             labels,
+            fixups,
         )
 
         if result is None:
@@ -236,6 +340,14 @@ def compile_lmc(instructions: list[str], labels: Labels) -> list[int | Lazy] | N
         else:
             machine_code.append(result)
 
+    for index, op_code, label in fixups:
+        address = labels.get(label)
+        if address is None:
+            print(f"error: label '{label}' not found")
+            exit(1)
+
+        machine_code[index] = op_code + address
+
     return machine_code
 
 
@@ -255,6 +367,61 @@ def syntax_error(line: int, instruction: str, hint: str, error: str) -> None:
     exit(1)
 
 
+def cache_key(data: str) -> str:
+    """The cache key for a program.
+
+    The assembler source is part of the key, so changes to the assembler
+    invalidate the cache.
+
+    Args:
+        data (str): The LMC assembly.
+
+    Returns:
+        str: The cache key.
+    """
+    key = hashlib.blake2b(Path(__file__).read_bytes())
+    key.update(data.encode())
+    return key.hexdigest()
+
+
+def load_cached(key: str) -> list[int] | None:
+    """Loads previously compiled machine code from the cache.
+
+    Args:
+        key (str): The cache key of the program.
+
+    Returns:
+        list[int] | None: The machine code. None if it is not cached or the
+            cache entry is unreadable.
+    """
+    try:
+        with open(CACHE_DIR / f"{key}.txt", "r", encoding="utf8") as file:
+            return [int(line) for line in file]
+    except (OSError, ValueError):
+        return None
+
+
+def store_cached(key: str, op_codes: list[int]) -> None:
+    """Stores compiled machine code in the cache. Failures are ignored.
+
+    The machine code is stored in the same one-opcode-per-line format
+    the assembler outputs.
+
+    Args:
+        key (str): The cache key of the program.
+        op_codes (list[int]): The machine code.
+    """
+    path = CACHE_DIR / f"{key}.txt"
+    partial = path.with_suffix(f".{os.getpid()}.tmp")
+    try:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        with open(partial, "w", encoding="utf8") as file:
+            file.writelines(f"{op_code}\n" for op_code in op_codes)
+        os.replace(partial, path)
+    except OSError:
+        pass
+
+
 def main(fp: str):
     """The main function.
 
@@ -264,14 +431,20 @@ def main(fp: str):
     with open(fp, "r", encoding="utf8") as file:
         data = file.read()
 
-    instructions = data.split("\n")
-    labels: Labels = {}
+    key = cache_key(data)
+    op_codes = load_cached(key)
 
-    op_codes = compile_lmc(instructions, labels)
     if op_codes is None:
-        exit(1)
+        instructions = data.split("\n")
+        labels: Labels = {}
+
+        op_codes = compile_lmc(instructions, labels)
+        if op_codes is None:
+            exit(1)
+
+        store_cached(key, op_codes)
 
-    print("\n".join([str(op_code) for op_code in op_codes]))
+    sys.stdout.writelines(f"{op_code}\n" for op_code in op_codes)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,232 @@
+"""Translates LMC programs into Python source.
+
+Every basic block of the program becomes a straight-line chunk of Python
+working on local variables, so running it skips the per-instruction decode
+and dispatch of the interpreter in sim.py.
+"""
+
+from __future__ import annotations
+
+import sys
+from array import array
+from typing import Any, Callable, Iterable, TypeAlias
+
+from sim import INVALID, InputList, LMCState, as_inputs, decode, read_input
+from sim import sim as interpret
+
+Program: TypeAlias = Callable[[array, InputList, list[int]], tuple[int, int]]
+"""A compiled program, takes the memory, inputs and output
+and returns the final program counter and accumulator."""
+
+TAB = "    "
+
+
+def successors(pc: int, opcode: int) -> list[int]:
+    """The addresses execution can continue at after an instruction.
+
+    Args:
+        pc (int): The address of the instruction.
+        opcode (int): The opcode of the instruction.
+
+    Returns:
+        list[int]: The addresses, empty if the instruction stops the program.
+    """
+    instruction, operand = decode(opcode)
+    if instruction in (0, INVALID):
+        return []
+    elif instruction == 6:
+        return [operand]
+    elif instruction in (7, 8):
+        return [operand, pc + 1]
+    return [pc + 1]
+
+
+def reachable(memory: array[int]) -> set[int]:
+    """Finds every address that can be executed, starting at address 0.
+
+    Args:
+        memory (array[int]): The memory of the LMC.
+
+    Returns:
+        set[int]: The reachable addresses.
+    """
+    seen: set[int] = set()
+    todo = [0]
+    while todo:
+        pc = todo.pop()
+        if pc in seen or pc >= len(memory):
+            continue
+
+        seen.add(pc)
+        todo.extend(successors(pc, memory[pc]))
+
+    return seen
+
+
+def writes_code(memory: array[int], code: set[int]) -> bool:
+    """Whether the program stores into its own code.
+
+    Args:
+        memory (array[int]): The memory of the LMC.
+        code (set[int]): The reachable addresses.
+
+    Returns:
+        bool: Whether any reachable STA targets a reachable address.
+    """
+    for pc in code:
+        instruction, operand = decode(memory[pc])
+        if instruction == 3 and operand in code:
+            return True
+    return False
+
+
+def jump(indent: str, target: int, memory_size: int) -> list[str]:
+    """The source lines continuing execution at an address.
+
+    Args:
+        indent (str): The indentation of the lines.
+        target (int): The address to continue at.
+        memory_size (int): The size of the memory.
+
+    Returns:
+        list[str]: The source lines. Targets past the end of memory stop the program.
+    """
+    if target >= memory_size:
+        return [f"{indent}return {target}, acc"]
+    return [f"{indent}pc = {target}", f"{indent}continue"]
+
+
+def translate(memory: array[int], code: set[int]) -> str:
+    """Translates a program into the source of a Python function `program`.
+
+    Args:
+        memory (array[int]): The memory of the LMC.
+        code (set[int]): The reachable addresses.
+
+    Returns:
+        str: The source code.
+    """
+    leaders = {0}
+    for pc in code:
+        instruction, operand = decode(memory[pc])
+        if instruction in (6, 7, 8):
+            leaders.add(operand)
+
+    lines = [
+        "def program(memory, inputs, output):",
+        TAB + "acc = 0",
+        TAB + "pc = 0",
+        TAB + "while True:",
+    ]
+    keyword = "if"
+    for leader in sorted(leaders & code):
+        lines.append(f"{TAB * 2}{keyword} pc == {leader}:")
+        keyword = "elif"
+
+        body = TAB * 3
+        pc = leader
+        while True:
+            if pc >= len(memory):
+                lines.append(f"{body}return {pc}, acc")
+                break
+            if pc != leader and pc in leaders:
+                lines.append(f"{body}pc = {pc}")
+                lines.append(f"{body}continue")
+                break
+
+            instruction, operand = decode(memory[pc])
+            if instruction == 0:
+                lines.append(f"{body}return {pc}, acc")
+                break
+            elif instruction == 1:
+                lines.append(f"{body}acc += memory[{operand}]")
+            elif instruction == 2:
+                lines.append(f"{body}acc -= memory[{operand}]")
+            elif instruction == 3:
+                lines.append(f"{body}memory[{operand}] = acc")
+            elif instruction == 5:
+                lines.append(f"{body}acc = memory[{operand}]")
+            elif instruction == 6:
+                lines.extend(jump(body, operand, len(memory)))
+                break
+            elif instruction in (7, 8):
+                condition = "acc == 0" if instruction == 7 else "acc >= 0"
+                lines.append(f"{body}if {condition}:")
+                lines.extend(jump(body + TAB, operand, len(memory)))
+            elif instruction == 9:
+                if operand == 1:
+                    lines.append(
+                        f"{body}acc = read_input(inputs, interactive=interactive)"
+                    )
+                elif operand == 2:
+                    lines.append(f"{body}output.append(acc)")
+            else:
+                lines.append(
+                    f'{body}raise ValueError("Invalid instruction {memory[pc] // 100}")'
+                )
+                break
+
+            pc += 1
+
+    return "\n".join(lines) + "\n"
+
+
+def compile_program(
+    memory: array[int],
+    code: set[int],
+    *,
+    interactive: bool,
+) -> Program:
+    """Translates a program and compiles it into a Python function.
+
+    Args:
+        memory (array[int]): The memory of the LMC.
+        code (set[int]): The reachable addresses.
+        interactive (bool): Whether the program can be interactive.
+
+    Returns:
+        Program: The compiled program.
+    """
+    namespace: dict[str, Any] = {"read_input": read_input, "interactive": interactive}
+    exec(compile(translate(memory, code), "<lmc>", "exec"), namespace)
+    return namespace["program"]
+
+
+def sim(
+    opcodes: array[int],
+    inputs: InputList | Iterable[int],
+    *,
+    interactive: bool,
+) -> LMCState:
+    """Simulate the execution of a program on the LMC by compiling it to Python.
+
+    Programs that store into their own code cannot be translated ahead of time,
+    they fall back to the interpreter in sim.py.
+
+    Args:
+        opcodes (array[int]): The opcodes of the program to be executed.
+        inputs (InputList | Iterable[int]): The inputs to the LMC.
+            Other iterables than InputList are wrapped in one.
+        interactive (bool): Whether the program can be interactive.
+
+    Returns:
+        LMCState: The final state of the LMC.
+    """
+    inputs = as_inputs(inputs)
+
+    code = reachable(opcodes)
+    if not code:
+        # empty memory, there is nothing to run
+        return LMCState(pc=0, acc=0, memory=opcodes, input=inputs, output=[])
+
+    if writes_code(opcodes, code):
+        print(
+            "warning: program writes to its own code, falling back to the interpreter",
+            file=sys.stderr,
+        )
+        return interpret(opcodes, inputs, interactive=interactive)
+
+    program = compile_program(opcodes, code, interactive=interactive)
+    lmc = LMCState(pc=0, acc=0, memory=opcodes, input=inputs, output=[])
+    lmc.pc, lmc.acc = program(lmc.memory, lmc.input, lmc.output)
+    return lmc
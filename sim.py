@@ -1,36 +1,188 @@
+from __future__ import annotations
+
 import sys
+from array import array
 from dataclasses import dataclass
-from typing import SupportsIndex, TextIO
+from functools import partial
+from typing import Callable, Iterable, TextIO, TypeAlias
+
+try:
+    from sim_cython import run as _native_run
+except ImportError:
+    _native_run = None
+
+
+class InputList:
+    """The inputs to the LMC, prompts for integers when exhausted.
+
+    A prompt reads a whole line, so several whitespace separated integers
+    can be entered at once.
+    """
+
+    def __init__(self, items: Iterable[int] = ()):
+        """Creates the inputs.
+
+        Args:
+            items (Iterable[int], optional): Inputs known up front. Defaults to none.
+        """
+        self._buf = list(items)
+        self._idx = 0
+
+    def next(self) -> int:
+        """Get the next input.
+
+        Returns:
+            int: The next input.
+        """
+        while self._idx == len(self._buf):
+            self._buf = [int(item) for item in input("Input: ").split()]
+            self._idx = 0
 
+        item = self._buf[self._idx]
+        self._idx += 1
+        return item
 
-@dataclass
+
+def as_inputs(inputs: InputList | Iterable[int]) -> InputList:
+    """Wrap plain inputs in an InputList.
+
+    Args:
+        inputs (InputList | Iterable[int]): The inputs to the LMC.
+
+    Returns:
+        InputList: The inputs, unchanged if they already are an InputList.
+    """
+    if isinstance(inputs, InputList):
+        return inputs
+    return InputList(inputs)
+
+
+@dataclass(slots=True)
 class LMCState:
     """The state of the LMC.
 
     Attributes:
         pc (int): The program counter.
         acc (int): The accumulator.
-        memory (list[int]): The memory of the LMC.
+        memory (array[int]): The memory of the LMC.
     """
 
     pc: int
     """The program counter."""
     acc: int
     """The accumulator."""
-    memory: list[int]
+    memory: array[int]
     """The memory of the LMC."""
-    input: list[int]
+    input: InputList
     """The input to the LMC."""
     output: list[int]
     """The output of the LMC."""
 
 
+Handler: TypeAlias = Callable[[int, LMCState, bool], LMCState | None]
+"""An instruction handler, takes the operand, the state and whether the program
+can be interactive."""
+
+
+def read_input(inputs: InputList, *, interactive: bool) -> int:
+    """Read the next input, exits if the program cannot be interactive.
+
+    Args:
+        inputs (InputList): The inputs to the LMC.
+        interactive (bool): Whether the program can be interactive.
+
+    Returns:
+        int: The next input.
+    """
+    if not interactive:
+        print(
+            "error: cannot read input in non-interactive mode",
+            file=sys.stderr,
+        )
+        sys.exit(1)
+
+    return inputs.next()
+
+
+def _hlt(operand: int, lmc: LMCState, interactive: bool) -> LMCState | None:
+    """HLT - halt."""
+    return None
+
+
+def _add(operand: int, lmc: LMCState, interactive: bool) -> LMCState | None:
+    """ADD - add a memory cell to the accumulator."""
+    lmc.acc += lmc.memory[operand]
+    lmc.pc += 1
+    return lmc
+
+
+def _sub(operand: int, lmc: LMCState, interactive: bool) -> LMCState | None:
+    """SUB - subtract a memory cell from the accumulator."""
+    lmc.acc -= lmc.memory[operand]
+    lmc.pc += 1
+    return lmc
+
+
+def _sta(operand: int, lmc: LMCState, interactive: bool) -> LMCState | None:
+    """STA - store the accumulator in a memory cell."""
+    lmc.memory[operand] = lmc.acc
+    lmc.pc += 1
+    return lmc
+
+
+def _lda(operand: int, lmc: LMCState, interactive: bool) -> LMCState | None:
+    """LDA - load a memory cell into the accumulator."""
+    lmc.acc = lmc.memory[operand]
+    lmc.pc += 1
+    return lmc
+
+
+def _bra(operand: int, lmc: LMCState, interactive: bool) -> LMCState | None:
+    """BRA - branch."""
+    lmc.pc = operand
+    return lmc
+
+
+def _brz(operand: int, lmc: LMCState, interactive: bool) -> LMCState | None:
+    """BRZ - branch if zero."""
+    lmc.pc = operand if lmc.acc == 0 else lmc.pc + 1
+    return lmc
+
+
+def _brp(operand: int, lmc: LMCState, interactive: bool) -> LMCState | None:
+    """BRP - branch if positive."""
+    lmc.pc = operand if lmc.acc >= 0 else lmc.pc + 1
+    return lmc
+
+
+def _io(operand: int, lmc: LMCState, interactive: bool) -> LMCState | None:
+    """INP - read an input into the accumulator, OUT - output the accumulator."""
+    if operand == 1:
+        lmc.acc = read_input(lmc.input, interactive=interactive)
+    elif operand == 2:
+        lmc.output.append(lmc.acc)
+    lmc.pc += 1
+    return lmc
+
+
+_DISPATCH: dict[int, Handler] = {
+    0: _hlt,
+    1: _add,
+    2: _sub,
+    3: _sta,
+    5: _lda,
+    6: _bra,
+    7: _brz,
+    8: _brp,
+    9: _io,
+}
+
+
 def tick(opcode: int, lmc: LMCState, *, interactive: bool) -> LMCState | None:
     """Execute a single instruction on the LMC.
 
     Args:
         opcode (int): The opcode of the instruction to be executed.
-        inputs (list[int]): The inputs to the LMC.
         lmc (LMCState): The current state of the LMC.
         interactive (bool): Whether the program can be interactive.
 
@@ -40,95 +192,126 @@ def tick(opcode: int, lmc: LMCState, *, interactive: bool) -> LMCState | None:
     instruction = opcode // 100
     operand = opcode % 100
 
-    if instruction == 0:
-        # HLT
-        return None
-    elif instruction == 1:
-        # ADD
-        value = lmc.memory[operand]
-        lmc.acc += value
-    elif instruction == 2:
-        value = lmc.memory[operand]
-        lmc.acc -= value
-    elif instruction == 3:
-        lmc.memory[operand] = lmc.acc
-    elif instruction == 5:
-        lmc.acc = lmc.memory[operand]
-    elif instruction == 6:
-        # BRA - branch
-        lmc.pc = operand
-        return lmc
-    elif instruction == 7:
-        # BRZ - branch if zero
-        if lmc.acc == 0:
-            lmc.pc = operand
-            return lmc
-    elif instruction == 8:
-        # BRP - branch if positive
-        if lmc.acc >= 0:
-            lmc.pc = operand
-            return lmc
-    elif instruction == 9:
-        # IO
-        if operand == 1:
-            # INP
-            if not interactive:
-                print(
-                    "error: cannot read input in non-interactive mode",
-                    file=sys.stderr,
-                )
-                sys.exit(1)
-
-            lmc.acc = lmc.input.pop(0)
-        elif operand == 2:
-            # OUT
-            lmc.output.append(lmc.acc)
-    else:
+    handler = _DISPATCH.get(instruction)
+    if handler is None:
         raise ValueError(f"Invalid instruction {instruction}")
 
-    lmc.pc += 1
-    return lmc
+    return handler(operand, lmc, interactive)
 
 
-def sim(opcodes: list[int], inputs: list[int], *, interactive: bool) -> LMCState:
+INVALID = 4
+"""The instruction number used for opcodes that do not decode to an instruction."""
+
+
+def decode(opcode: int) -> tuple[int, int]:
+    """Split an opcode into its instruction and operand.
+
+    Args:
+        opcode (int): The opcode to decode.
+
+    Returns:
+        tuple[int, int]: The instruction and the operand.
+            Opcodes outside of 0-999 decode to INVALID.
+    """
+    if 0 <= opcode < 1000:
+        return divmod(opcode, 100)
+    return INVALID, 0
+
+
+def sim(
+    opcodes: array[int],
+    inputs: InputList | Iterable[int],
+    *,
+    interactive: bool,
+) -> LMCState:
     """Simulate the execution of a program on the LMC.
 
+    The memory is decoded once up front into an instruction and an operand
+    table and the whole dispatch runs on local variables, the state is only
+    written back once the program stops. Writes done by STA re-decode the
+    written cell.
+
+    If the sim_cython extension is built, int arrays run there instead.
+
     Args:
-        opcodes (list[int]): The opcodes of the program to be executed.
-        inputs (list[int]): The inputs to the LMC.
+        opcodes (array[int]): The opcodes of the program to be executed.
+        inputs (InputList | Iterable[int]): The inputs to the LMC.
+            Other iterables than InputList are wrapped in one.
         interactive (bool, optional): Whether the program can be interactive.
 
     Returns:
         LMCState: The final state of the LMC.
     """  # noqa: E501
-    lmc = LMCState(pc=0, acc=0, memory=opcodes, input=inputs, output=[])
+    inputs = as_inputs(inputs)
 
-    while lmc.pc < len(lmc.memory):
-        opcode = lmc.memory[lmc.pc]
-        value = tick(opcode, lmc, interactive=interactive)
-        if value is None:
-            break
-
-    return lmc
-
-
-class InputList(list[int]):
-    """A list that prompts for integers when empty."""
+    lmc = LMCState(pc=0, acc=0, memory=opcodes, input=inputs, output=[])
+    if (
+        _native_run is not None
+        and isinstance(opcodes, array)
+        and opcodes.typecode == "i"
+    ):
+        read = partial(read_input, inputs, interactive=interactive)
+        lmc.pc, lmc.acc = _native_run(lmc.memory, read, lmc.output)
+        return lmc
 
-    def pop(self, index: SupportsIndex = -1, /) -> int:
-        """Pop an item from the list.
+    memory = lmc.memory
+    memory_size = len(memory)
+    output = lmc.output
 
-        Args:
-            index (SupportsIndex, optional): The index of the item to pop. Defaults to -1.
+    decoded = [decode(opcode) for opcode in memory]
+    ops = [instruction for instruction, _ in decoded]
+    args = [operand for _, operand in decoded]
 
-        Returns:
-            int: The item that was popped.
-        """  # noqa: E501
-        if len(self) == 0:
-            item = int(input("Input: "))
-            return item
+    pc = 0
+    acc = 0
+    while pc < memory_size:
+        instruction = ops[pc]
+        operand = args[pc]
 
-        return super().pop(index)
+        if instruction == 0:
+            # HLT
+            break
+        elif instruction == 1:
+            # ADD
+            acc += memory[operand]
+        elif instruction == 2:
+            # SUB
+            acc -= memory[operand]
+        elif instruction == 3:
+            # STA
+            memory[operand] = acc
+            ops[operand], args[operand] = decode(acc)
+        elif instruction == 5:
+            # LDA
+            acc = memory[operand]
+        elif instruction == 6:
+            # BRA - branch
+            pc = operand
+            continue
+        elif instruction == 7:
+            # BRZ - branch if zero
+            pc = operand if acc == 0 else pc + 1
+            continue
+        elif instruction == 8:
+            # BRP - branch if positive
+            pc = operand if acc >= 0 else pc + 1
+            continue
+        elif instruction == 9:
+            # IO
+            if operand == 1:
+                # INP
+                acc = read_input(inputs, interactive=interactive)
+            elif operand == 2:
+                # OUT
+                output.append(acc)
+        else:
+            raise ValueError(f"Invalid instruction {memory[pc] // 100}")
+
+        pc += 1
+
+    lmc.pc = pc
+    lmc.acc = acc
+    return lmc
 
 
 def main(file: TextIO, *, interactive: bool) -> None:
@@ -137,14 +320,14 @@ def main(file: TextIO, *, interactive: bool) -> None:
     Args:
         fp (str): The filepath to the input file.
     """
-    opcodes = [int(line) for line in file]
+    opcodes = array("i", map(int, file))
 
-    memory = opcodes.copy()
-    memory.extend([0] * (100 - len(opcodes)))
+    memory = array("i", [0]) * max(100, len(opcodes))
+    memory[: len(opcodes)] = opcodes
 
     lmc = sim(memory, InputList(), interactive=interactive)
 
-    print("\n".join(str(x) for x in lmc.output))
+    sys.stdout.writelines(f"{x}\n" for x in lmc.output)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,79 @@
+# cython: language_level=3, boundscheck=True, wraparound=False
+"""The sim loop of sim.py with typed locals, compiled with Cython.
+
+Build in place with `cythonize -i sim_cython.pyx`. sim.py uses it when it is
+built and falls back to its pure Python loop otherwise.
+"""
+
+from libc.limits cimport INT_MAX, INT_MIN
+
+
+def run(int[::1] memory, read, list output):
+    """Run a program on the LMC until it halts or runs off the end of memory.
+
+    Args:
+        memory (array[int]): The memory of the LMC, modified in place.
+        read (Callable[[], int]): Returns the next input.
+        output (list[int]): The output of the LMC, appended to.
+
+    Returns:
+        tuple[int, int]: The program counter and the accumulator.
+    """
+    cdef Py_ssize_t memory_size = memory.shape[0]
+    cdef Py_ssize_t pc = 0
+    cdef long long acc = 0
+    cdef int opcode, instruction, operand
+
+    while pc < memory_size:
+        opcode = memory[pc]
+        if opcode < 0 or opcode >= 1000:
+            raise ValueError(f"Invalid instruction {opcode // 100}")
+
+        instruction = opcode // 100
+        operand = opcode % 100
+
+        if instruction == 0:
+            # HLT
+            break
+        elif instruction == 1:
+            # ADD
+            acc += memory[operand]
+        elif instruction == 2:
+            # SUB
+            acc -= memory[operand]
+        elif instruction == 3:
+            # STA
+            if acc > INT_MAX:
+                raise OverflowError("signed integer is greater than maximum")
+            if acc < INT_MIN:
+                raise OverflowError("signed integer is less than minimum")
+            memory[operand] = <int>acc
+        elif instruction == 5:
+            # LDA
+            acc = memory[operand]
+        elif instruction == 6:
+            # BRA - branch
+            pc = operand
+            continue
+        elif instruction == 7:
+            # BRZ - branch if zero
+            pc = operand if acc == 0 else pc + 1
+            continue
+        elif instruction == 8:
+            # BRP - branch if positive
+            pc = operand if acc >= 0 else pc + 1
+            continue
+        elif instruction == 9:
+            # IO
+            if operand == 1:
+                # INP
+                acc = read()
+            elif operand == 2:
+                # OUT
+                output.append(acc)
+        else:
+            raise ValueError(f"Invalid instruction {instruction}")
+
+        pc += 1
+
+    return pc, acc
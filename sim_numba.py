@@ -0,0 +1,161 @@
+"""An LMC simulator compiled with Numba.
+
+Requires numpy and numba. Unlike sim.py, all inputs have to be known up front.
+"""
+
+import sys
+from array import array
+from typing import TextIO
+
+import numpy as np
+from numba import njit
+
+from sim import InputList, LMCState
+
+INT32_MIN = -(2**31)
+INT32_MAX = 2**31 - 1
+
+
+@njit(cache=True, boundscheck=True)
+def run(memory, inputs, outputs, pc, acc, n_in, n_out):
+    """Run a program on the LMC until it halts, runs off the end of memory
+    or fills the output buffer.
+
+    Args:
+        memory (np.ndarray): The int32 memory of the LMC, modified in place.
+        inputs (np.ndarray): The int32 inputs to the LMC.
+        outputs (np.ndarray): An int32 buffer for the output of the LMC.
+        pc (int): The program counter to start at.
+        acc (int): The accumulator to start with.
+        n_in (int): The number of inputs already read.
+        n_out (int): The number of outputs already written.
+
+    Returns:
+        tuple[int, int, int, int, bool]: The program counter, the accumulator,
+            the number of inputs read, the number of outputs and whether the
+            output buffer is full. If it is, pc points at the OUT that could
+            not be executed and running again with a larger buffer resumes it.
+    """
+    while pc < memory.shape[0]:
+        opcode = memory[pc]
+        if opcode < 0 or opcode >= 1000:
+            raise ValueError("Invalid instruction " + str(opcode // 100))
+
+        instruction = opcode // 100
+        operand = opcode - instruction * 100
+
+        if instruction == 0:
+            # HLT
+            break
+        elif instruction == 1:
+            # ADD
+            acc += memory[operand]
+        elif instruction == 2:
+            # SUB
+            acc -= memory[operand]
+        elif instruction == 3:
+            # STA
+            if acc > INT32_MAX:
+                raise OverflowError("signed integer is greater than maximum")
+            if acc < INT32_MIN:
+                raise OverflowError("signed integer is less than minimum")
+            memory[operand] = acc
+        elif instruction == 5:
+            # LDA
+            acc = memory[operand]
+        elif instruction == 6:
+            # BRA - branch
+            pc = operand
+            continue
+        elif instruction == 7:
+            # BRZ - branch if zero
+            pc = operand if acc == 0 else pc + 1
+            continue
+        elif instruction == 8:
+            # BRP - branch if positive
+            pc = operand if acc >= 0 else pc + 1
+            continue
+        elif instruction == 9:
+            # IO
+            if operand == 1:
+                # INP
+                if n_in == inputs.shape[0]:
+                    raise ValueError("Not enough inputs")
+                acc = inputs[n_in]
+                n_in += 1
+            elif operand == 2:
+                # OUT
+                if n_out == outputs.shape[0]:
+                    return pc, acc, n_in, n_out, True
+                outputs[n_out] = acc
+                n_out += 1
+        else:
+            raise ValueError("Invalid instruction " + str(instruction))
+
+        pc += 1
+
+    return pc, acc, n_in, n_out, False
+
+
+def sim(opcodes: list[int] | np.ndarray, inputs: list[int]) -> LMCState:
+    """Simulate the execution of a program on the LMC.
+
+    The program is copied into a zeroed memory of at least 100 cells.
+
+    Args:
+        opcodes (list[int] | np.ndarray): The opcodes of the program to be executed.
+        inputs (list[int]): The inputs to the LMC.
+
+    Returns:
+        LMCState: The final state of the LMC. The inputs are not consumed.
+    """
+    program = np.asarray(opcodes, dtype=np.int32)
+    memory = np.zeros(max(100, len(program)), dtype=np.int32)
+    memory[: len(program)] = program
+
+    input_array = np.asarray(inputs, dtype=np.int32)
+    outputs = np.empty(64, dtype=np.int32)
+
+    pc, acc, n_in, n_out, full = run(memory, input_array, outputs, 0, 0, 0, 0)
+    while full:
+        # the output buffer is full, grow it and continue where the run stopped
+        outputs = np.concatenate((outputs, np.empty_like(outputs)))
+        pc, acc, n_in, n_out, full = run(
+            memory, input_array, outputs, pc, acc, n_in, n_out
+        )
+
+    return LMCState(
+        pc=int(pc),
+        acc=int(acc),
+        memory=array("i", memory.tolist()),
+        input=InputList(inputs),
+        output=outputs[:n_out].tolist(),
+    )
+
+
+def main(file: TextIO, inputs: list[int]) -> None:
+    """CLI Entry point.
+
+    Args:
+        file (TextIO): The file containing the program.
+        inputs (list[int]): The inputs to the LMC.
+    """
+    opcodes = np.loadtxt(file, dtype=np.int32, ndmin=1)
+
+    lmc = sim(opcodes, inputs)
+
+    sys.stdout.writelines(f"{x}\n" for x in lmc.output)
+
+
+if __name__ == "__main__":
+    file: TextIO
+    if len(sys.argv) < 2:
+        print("error: no input file", file=sys.stderr)
+        sys.exit(1)
+
+    if sys.argv[1] == "-":
+        file = sys.stdin
+    else:
+        file = open(sys.argv[1])
+
+    main(file, [int(item) for item in sys.argv[2:]])